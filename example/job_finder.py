@@ -1,8 +1,53 @@
 import argparse
-from operator import itemgetter
+
+import numpy as np
 
 import pyfseconomy as fse
-from pyfseconomy.utils import plane_loader
+from pyfseconomy.utils import index_assignments, order_assignment_by_value, plane_loader
+
+# Upper bound on the relative error of the great circle approximation compared to WGS84, which reaches about 0.6%
+GREAT_CIRCLE_TOLERANCE = 0.01
+
+
+def get_job_distances(departure_icaos, arrival_icaos, distance_limit=None):
+    """
+    Calculate the distance for each departure and arrival pair. A fast great circle approximation is used for all
+    pairs, with the precise WGS84 distance only calculated for pairs close enough to the distance limit that the
+    approximation could put them on the wrong side of it. Pairs well outside the distance limit are given an infinite
+    distance.
+
+    :param departure_icaos: List of departure ICAOs
+    :param arrival_icaos: List of arrival ICAOs, paired with departure_icaos
+    :param distance_limit: Max distance you're interested in
+    :return: Dictionary of distances in NM keyed by (departure, arrival) pair
+    """
+    if distance_limit is None:
+        distances = fse.Airports.get_airport_distances(departure_icaos, arrival_icaos)
+    else:
+        # Widen the search so pairs within the limit by WGS84 but not the great circle are still considered
+        search_distance = distance_limit * (1 + GREAT_CIRCLE_TOLERANCE)
+        distances = fse.Airports.get_airport_distances(departure_icaos, arrival_icaos, max_distance=search_distance)
+        borderline = np.abs(distances - distance_limit) <= distance_limit * GREAT_CIRCLE_TOLERANCE
+        for idx in np.flatnonzero(borderline):
+            distances[idx] = fse.Airports.get_airport_distance(departure_icaos[idx], arrival_icaos[idx])
+
+    return dict(zip(zip(departure_icaos, arrival_icaos), distances.tolist()))
+
+
+def top_n_indices(values, top_n):
+    """
+    Find the indices of the N largest values without sorting the whole array. Equal values keep their original order.
+
+    :param values: Array of values
+    :param top_n: How many indices to return
+    :return: Indices of the N largest values, largest first
+    """
+    if 0 < top_n < len(values):
+        nth_largest = -np.partition(-values, top_n - 1)[top_n - 1]
+        candidates = np.flatnonzero(values >= nth_largest)
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.argsort(-values[candidates], kind='stable')][:top_n]
 
 
 def highest_paying_jobs(fse_client, plane_type, distance_limit=None, minimum_pay=0, top_n=5,
@@ -25,17 +70,17 @@ def highest_paying_jobs(fse_client, plane_type, distance_limit=None, minimum_pay
         plane_list = fse_client.get_user_planes(username)
     else:
         plane_list = fse_client.get_planes_of_type(plane_type, rentable_only=rentable_only)
-    plane_location_list = []
-    for _, plane in plane_list.iterrows():
-        if plane['Location'] != 'In Flight':
-            plane_location_list.append(plane['Location'])
-    plane_location_list = list(set(plane_location_list))  # ensure unique
-    plane_list.set_index("SerialNumber", inplace=True)
+    plane_location_list = plane_list.loc[plane_list['Location'] != 'In Flight', 'Location'].unique().tolist()
+    # Serial number, make/model and fuel percentage of the planes at each location
+    planes_by_location = {location: (planes['SerialNumber'].tolist(), planes['MakeModel'].tolist(),
+                                     planes['PctFuel'].tolist())
+                          for location, planes in plane_list.groupby('Location', observed=True)}
 
     print(f"Searching for jobs in {len(plane_location_list)} airports for {len(plane_list)} planes")
     jobs = fse_client.get_location_available_jobs(plane_location_list,
                                                   limit_trip_type_to=desired_trip_type)
     print(f"Analysing {len(jobs)} jobs...")
+    aircraft_data = fse_client.get_plane_data()
 
     # Get a list of departure_icao locations
     # For each departure_icao location we:
@@ -44,44 +89,52 @@ def highest_paying_jobs(fse_client, plane_type, distance_limit=None, minimum_pay
     #       - calculate $/kg and sort (person weighs 77kg in FSE)
     #       - sum assignments to requested_plane based on top $/kg
     #       - calculate $/NM and store in list
-    assignment_list = []
-    departure_locations = list(set(jobs['Location'].tolist()))
-    aircraft_data = client.get_plane_data()
-    for plane_location in departure_locations:
-        airport_assignments = jobs[(jobs['Location'] == plane_location)]
-        assignment_destinations = list(set(airport_assignments['ToIcao'].tolist()))
-        for destination in assignment_destinations:
-            destination_assignments = airport_assignments[airport_assignments['ToIcao'] == destination]
-
-            job_distance = fse.Airports.get_airport_distance(plane_location, destination)
+    # Candidate jobs are stored column by column, job dictionaries are only built for the top N
+    plane_ids, departures, arrivals, distances, pays, load_lists = [], [], [], [], [], []
+    job_pairs = jobs[['Location', 'ToIcao']].drop_duplicates()
+    job_distances = get_job_distances(job_pairs['Location'].tolist(), job_pairs['ToIcao'].tolist(), distance_limit)
+    for plane_location, airport_assignments in jobs.groupby('Location', sort=False, observed=True):
+        serials, make_models, fuel_pcts = planes_by_location.get(plane_location, ([], [], []))
+        for destination, destination_assignments in airport_assignments.groupby('ToIcao', sort=False, observed=True):
+            job_distance = job_distances[(plane_location, destination)]
             if distance_limit is not None and job_distance > distance_limit:
                 continue
-
-            planes_at_location = plane_list[plane_list['Location'] == plane_location]
-            for serial, plane_at_location in planes_at_location.iterrows():
-                plane_model_data = aircraft_data[plane_at_location['MakeModel']]
-                trip_pay, trip_load_list = plane_loader(destination_assignments, serial,
-                                                        fuel_pct=plane_at_location['PctFuel'],
-                                                        aircraft_data=plane_model_data)
-                if job_distance == 0:
-                    job_distance = 1
-
-                job_info = {'plane_id': serial,
-                            'from': plane_location,
-                            'to': destination,
-                            'distance': job_distance,
-                            'pay': trip_pay,
-                            'assignments': trip_load_list,
-                            'dollar_per_nm': trip_pay / job_distance
-                            }
-
+            if job_distance == 0:
+                job_distance = 1
+
+            destination_assignments_by_id = index_assignments(destination_assignments)
+            destination_assignment_values = order_assignment_by_value(destination_assignments)
+            for serial, make_model, fuel_pct in zip(serials, make_models, fuel_pcts):
+                plane_model_data = aircraft_data[make_model]
+                trip_pay, trip_load_list = plane_loader(destination_assignments, serial, fuel_pct=fuel_pct,
+                                                        aircraft_data=plane_model_data,
+                                                        assignments_by_id=destination_assignments_by_id,
+                                                        assignment_values=destination_assignment_values)
                 if trip_pay > minimum_pay:
-                    assignment_list.append(job_info)
-
-    sorted_assignment_list_per_nm = sorted(assignment_list, key=itemgetter('dollar_per_nm'), reverse=True)
-    sorted_assignment_list_total_pay = sorted(assignment_list, key=itemgetter('pay'), reverse=True)
-
-    return sorted_assignment_list_per_nm[:top_n], sorted_assignment_list_total_pay[:top_n]
+                    plane_ids.append(serial)
+                    departures.append(plane_location)
+                    arrivals.append(destination)
+                    distances.append(job_distance)
+                    pays.append(trip_pay)
+                    load_lists.append(trip_load_list)
+
+    pay_values = np.array(pays, dtype=float)
+    dollar_per_nm = pay_values / np.array(distances, dtype=float)
+
+    def job_info(idx):
+        return {'plane_id': plane_ids[idx],
+                'from': departures[idx],
+                'to': arrivals[idx],
+                'distance': distances[idx],
+                'pay': pays[idx],
+                'assignments': load_lists[idx],
+                'dollar_per_nm': float(dollar_per_nm[idx])
+                }
+
+    best_jobs_per_nm = [job_info(idx) for idx in top_n_indices(dollar_per_nm, top_n)]
+    best_jobs_total_pay = [job_info(idx) for idx in top_n_indices(pay_values, top_n)]
+
+    return best_jobs_per_nm, best_jobs_total_pay
 
 
 def print_jobs(jobs):
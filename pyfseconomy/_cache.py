@@ -0,0 +1,84 @@
+"""
+On disk cache of data that is expensive to load, kept between runs
+"""
+import contextlib
+import os
+import pickle
+import stat
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+def cache_dir():
+    """
+    Directory used for the on disk cache. Can be set with the PYFSECONOMY_CACHE_DIR environment variable, otherwise a
+    pyfseconomy directory in the user's cache directory is used.
+
+    :return: Path of the cache directory
+    """
+    if "PYFSECONOMY_CACHE_DIR" in os.environ:
+        return os.environ["PYFSECONOMY_CACHE_DIR"]
+    base_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base_dir, "pyfseconomy")
+
+
+def _is_trusted(path):
+    """
+    Check a cache file can only have been written by the current user, as unpickling it can run arbitrary code.
+
+    Ownership and permission bits are only meaningful on POSIX. Elsewhere, such as Windows where os.stat reports every
+    writable file as writable by all, the file is trusted as it is kept in the user's own profile by default.
+
+    :param path: Path of the cache file
+    :return: True if the file is owned by the current user and not writable by anyone else
+    """
+    file_stat = os.stat(path)
+    if os.name != "posix":
+        return True
+    if file_stat.st_uid != os.getuid():
+        return False
+    return not file_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def load_csv(csv_path):
+    """
+    Load a CSV file into a dataframe, using a pickled copy from the cache when one exists for this version of the CSV.
+
+    The cache file name includes the size and modification time of the CSV and the pandas and NumPy versions, so a
+    changed CSV or a different pandas or NumPy never reads a stale cache. Failing to read or write the cache falls back
+    to reading the CSV so the cache never stops the data being loaded.
+
+    :param csv_path: Path to the CSV file
+    :return: Dataframe of the CSV data
+    """
+    csv_stat = os.stat(csv_path)
+    cache_name = "{}-{}-{}-pandas{}-numpy{}.pkl".format(os.path.splitext(os.path.basename(csv_path))[0],
+                                                        csv_stat.st_size, csv_stat.st_mtime_ns, pd.__version__,
+                                                        np.__version__)
+    cache_path = os.path.join(cache_dir(), cache_name)
+    try:
+        if _is_trusted(cache_path):
+            return pd.read_pickle(cache_path)
+    except Exception:
+        # a cache that cannot be unpickled, for example one written against a different NumPy, is rebuilt below
+        pass
+
+    data = pd.read_csv(csv_path)
+    temp_path = None
+    try:
+        os.makedirs(os.path.dirname(cache_path), mode=0o700, exist_ok=True)
+        # write to a temporary file first so other processes never read a partial cache
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+        os.close(fd)
+        data.to_pickle(temp_path)
+        os.replace(temp_path, cache_path)
+    except (OSError, pickle.PicklingError):
+        pass
+    finally:
+        # the temporary file is only left behind if writing the cache failed
+        if temp_path is not None and os.path.exists(temp_path):
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+    return data
@@ -2,6 +2,7 @@
 Aircraft data
 """
 from enum import Enum, auto
+from functools import cached_property
 
 
 class AircraftTypes(Enum):
@@ -27,57 +28,50 @@ class AircraftTypes(Enum):
     TBM_850 = auto()
     HONDA_HJET = auto()
 
-    @staticmethod
-    def list():
+    @classmethod
+    def list(cls):
         """
         Generate a list strings for all aircraft supported
         :return: List of all aircraft in the enumeration by their strings
         """
-        return list(map(lambda a: str(a), AircraftTypes))
+        return [str(a) for a in cls]
 
     def __str__(self):
         """
         Convert enumeration into FSE alias string
         :return: FSE alias string
         """
-        if self.value == self.TBM_930.value:
-            return "Socata TBM 930 (MSFS)"
-        elif self.value == self.TBM_850.value:
-            return "Socata TBM 850"
-        elif self.value == self.KING_AIR_350.value:
-            return "Beechcraft King Air 350"
-        elif self.value == self.C172_SKYHAWK.value:
-            return "Cessna 172 Skyhawk"
-        elif self.value == self.C152_AEROBAT.value:
-            return "Cessna 152 Aerobat"
-        elif self.value == self.CITATION_X.value:
-            return "Cessna Citation X"
-        elif self.value == self.A320.value:
-            return "Airbus A320"
-        elif self.value == self.MSFS_A320.value:
-            return "Airbus A320 (MSFS)"
-        elif self.value == self.BOEING_737_800.value:
-            return "Boeing 737-800"
-        elif self.value == self.BOEING_747_400.value:
-            return "Boeing 747-400"
-        elif self.value == self.CESSNA_GRAND_CARAVAN.value:
-            return "Cessna 208 Caravan"
-        elif self.value == self.CITATION_CJ4_MSFS.value:
-            return "Cessna Citation CJ4 (MSFS)"
-        elif self.value == self.EMBRAER_PHENOM_300.value:
-            return "Embraer Phenom 300"
-        elif self.value == self.BOMBARDIER_CRJ_200.value:
-            return "Bombardier CRJ-200ER"
-        elif self.value == self.BOMBARDIER_CRJ_700.value:
-            return "Bombardier CRJ700-ER"
-        elif self.value == self.BOMBARDIER_DASH8_Q400.value:
-            return "Bombardier Dash-8 Q400"
-        elif self.value == self.HONDA_HJET.value:
-            return "Honda HA-420 HondaJet"
-        elif self.value == self.CITATION_LONGITUDE.value:
-            return "Cessna Citation Longitude"
-        else:
-            return f"Unknown plane type - {self.name}"
+        return self._alias
+
+    @cached_property
+    def _alias(self):
+        """
+        FSE alias string, looked up once per member
+        :return: FSE alias string
+        """
+        return _AIRCRAFT_TYPE_NAMES.get(self, f"Unknown plane type - {self.name}")
+
+
+_AIRCRAFT_TYPE_NAMES = {
+    AircraftTypes.TBM_930: "Socata TBM 930 (MSFS)",
+    AircraftTypes.TBM_850: "Socata TBM 850",
+    AircraftTypes.KING_AIR_350: "Beechcraft King Air 350",
+    AircraftTypes.C172_SKYHAWK: "Cessna 172 Skyhawk",
+    AircraftTypes.C152_AEROBAT: "Cessna 152 Aerobat",
+    AircraftTypes.CITATION_X: "Cessna Citation X",
+    AircraftTypes.A320: "Airbus A320",
+    AircraftTypes.MSFS_A320: "Airbus A320 (MSFS)",
+    AircraftTypes.BOEING_737_800: "Boeing 737-800",
+    AircraftTypes.BOEING_747_400: "Boeing 747-400",
+    AircraftTypes.CESSNA_GRAND_CARAVAN: "Cessna 208 Caravan",
+    AircraftTypes.CITATION_CJ4_MSFS: "Cessna Citation CJ4 (MSFS)",
+    AircraftTypes.EMBRAER_PHENOM_300: "Embraer Phenom 300",
+    AircraftTypes.BOMBARDIER_CRJ_200: "Bombardier CRJ-200ER",
+    AircraftTypes.BOMBARDIER_CRJ_700: "Bombardier CRJ700-ER",
+    AircraftTypes.BOMBARDIER_DASH8_Q400: "Bombardier Dash-8 Q400",
+    AircraftTypes.HONDA_HJET: "Honda HA-420 HondaJet",
+    AircraftTypes.CITATION_LONGITUDE: "Cessna Citation Longitude",
+}
 
 
 class Aircraft:
@@ -86,6 +80,8 @@ class Aircraft:
     """
     FUEL_KG_PER_GAL = 2.687344961
     PAX_WEIGHT_KG = 77
+    FUEL_TANK_COLUMNS = ['Ext1', 'LTip', 'LAux', 'LMain', 'Center1', 'Center2', 'Center3', 'RExt2', 'RTip', 'RAux',
+                         'RMain']
 
     def __init__(self, make_model, mtow, seats, crew, empty_weight, fuel_total, max_cargo=0):
         """
@@ -147,9 +143,23 @@ class Aircraft:
         :param csv_data: Pandas CSV dataframe created from FSE CSV
         :return: Aircraft class
         """
-        fuel_total = csv_data['Ext1'] + csv_data['LTip'] + csv_data['LAux'] + csv_data['LMain']
-        fuel_total += csv_data['Center1'] + csv_data['Center2'] + csv_data['Center3']
-        fuel_total += csv_data['RExt2'] + csv_data['RTip'] + csv_data['RAux'] + csv_data['RMain']
+        # added column by column so a missing tank capacity gives a missing total, as in aircraft_from_dataframe
+        fuel_total = sum(csv_data[column] for column in cls.FUEL_TANK_COLUMNS)
 
         return cls(csv_data['MakeModel'], csv_data['MTOW'], csv_data['Seats'], csv_data['Crew'],
                    csv_data['EmptyWeight'], fuel_total, csv_data['MaxCargo'])
+
+    @classmethod
+    def aircraft_from_dataframe(cls, csv_data):
+        """
+        Create an instance of an aircraft for every row of the FSE CSV.
+        :param csv_data: Pandas CSV dataframe created from FSE CSV
+        :return: Dictionary of Aircraft classes keyed by make and model
+        """
+        fuel_totals = csv_data[cls.FUEL_TANK_COLUMNS].sum(axis=1, skipna=False)
+
+        return {make_model: cls(make_model, mtow, seats, crew, empty_weight, fuel_total, max_cargo)
+                for make_model, mtow, seats, crew, empty_weight, fuel_total, max_cargo in
+                zip(csv_data['MakeModel'].tolist(), csv_data['MTOW'].tolist(), csv_data['Seats'].tolist(),
+                    csv_data['Crew'].tolist(), csv_data['EmptyWeight'].tolist(), fuel_totals.tolist(),
+                    csv_data['MaxCargo'].tolist())}
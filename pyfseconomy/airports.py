@@ -1,12 +1,15 @@
 """
 Handles information from the FSE airport database
 """
+import functools
 import os
 
+import numpy as np
 import pandas as pd
 from geographiclib.geodesic import Geodesic
 
-from pyfseconomy.utils import GeoLocation
+from pyfseconomy._cache import load_csv
+from pyfseconomy.utils import GeoLocation, bounding_coordinates_bulk
 
 DATA_LOCATION = os.path.join(os.path.dirname(__file__), "icaodata.csv")
 
@@ -16,7 +19,22 @@ class Airports:
     Class of methods that allow retrieval of useful information about airports.
     """
     METERS_PER_NM = 1852
-    _airport_data = pd.read_csv(DATA_LOCATION)
+    EARTH_RADIUS_NM = GeoLocation.EARTH_RADIUS_KM * 1000 / METERS_PER_NM
+    _airport_data = load_csv(DATA_LOCATION)
+    _latlon = None
+
+    @classmethod
+    def _get_latlon(cls, icao):
+        """
+        Get the latitude and longitude of an airport
+
+        :param icao: ICAO of airport
+        :return: Latitude and longitude of the airport
+        """
+        if cls._latlon is None:
+            df = cls._airport_data
+            cls._latlon = dict(zip(df['icao'], zip(df['lat'], df['lon'])))
+        return cls._latlon[icao]
 
     @classmethod
     def get_airport_distance(cls, departure_icao, arrival_icao):
@@ -51,17 +69,43 @@ class Airports:
         :param arrival_icao: ICAO of arrival airport
         :return: Distance in nautical miles and bearing
         """
-        airport_data = cls._airport_data.set_index("icao")
+        return _dist_bearing(departure_icao, arrival_icao)
 
-        result = Geodesic.WGS84.Inverse(airport_data.at[departure_icao, 'lat'], airport_data.at[departure_icao, 'lon'],
-                                        airport_data.at[arrival_icao, 'lat'], airport_data.at[arrival_icao, 'lon'])
-        distance_nm = result['s12'] / cls.METERS_PER_NM
-        bearing_def = result['azi1']
+    @classmethod
+    def get_airport_distances(cls, departure_icaos, arrival_icaos, max_distance=None):
+        """
+        Calculate the great circle distance in nautical miles for many pairs of airports at once
 
-        if bearing_def < 0:
-            bearing_def = 360 + bearing_def
+        Uses the haversine formula on a spherical earth. This differs from the WGS84 distance given by
+        get_airport_distance by up to about 0.6% but avoids a geodesic calculation per pair.
 
-        return distance_nm, bearing_def
+        :param departure_icaos: Sequence of departure airport ICAOs
+        :param arrival_icaos: Sequence of arrival airport ICAOs, paired with departure_icaos
+        :param max_distance: Optional search radius in NM. Pairs where the arrival is outside the bounding box of this
+                             radius around the departure are not calculated and are given an infinite distance.
+        :return: Array of distances in NM between each pair of airports
+        """
+        departure = np.array([cls._get_latlon(icao) for icao in departure_icaos], dtype=float).reshape(-1, 2)
+        arrival = np.array([cls._get_latlon(icao) for icao in arrival_icaos], dtype=float).reshape(-1, 2)
+
+        distances = np.full(len(departure), np.inf)
+        if max_distance is None:
+            candidates = np.ones(len(departure), dtype=bool)
+        else:
+            max_distance_km = max_distance * cls.METERS_PER_NM / 1000
+            min_lat, min_lon, max_lat, max_lon = bounding_coordinates_bulk(departure[:, 0], departure[:, 1],
+                                                                           max_distance_km)
+            lat, lon = arrival[:, 0], arrival[:, 1]
+            # the longitude range wraps when the bounding box crosses the anti-meridian
+            lon_in_range = np.where(min_lon <= max_lon, (min_lon <= lon) & (lon <= max_lon),
+                                    (min_lon <= lon) | (lon <= max_lon))
+            candidates = (min_lat <= lat) & (lat <= max_lat) & lon_in_range
+
+        lat1, lon1 = np.radians(departure[candidates]).T
+        lat2, lon2 = np.radians(arrival[candidates]).T
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        distances[candidates] = 2 * np.arcsin(np.sqrt(a)) * cls.EARTH_RADIUS_NM
+        return distances
 
     @classmethod
     def get_airports_within(cls, icao, max_distance, min_distance=0, civil_only=True):
@@ -74,27 +118,58 @@ class Airports:
         :param max_distance: Search radius - in nautical miles
         :return: Dataframe of airports within radius, giving their distance and heading
         """
-        airport_data_by_icao = cls._airport_data.set_index("icao")
         max_distance_km = max_distance * cls.METERS_PER_NM / 1000
 
-        # get the bounding coordinates for the radius
-        airport_location = GeoLocation(airport_data_by_icao.at[icao, 'lat'], airport_data_by_icao.at[icao, 'lon'])
-        min_lat, min_lon, max_lat, max_lon = airport_location.bounding_coordinates(max_distance_km)
-
-        # get locations within the bounding area, exclude self!
-        locations = cls._airport_data[(min_lon <= cls._airport_data['lon']) & (cls._airport_data['lon'] <= max_lon) &
-                                      (min_lat <= cls._airport_data['lat']) & (cls._airport_data['lat'] <= max_lat) &
-                                      (icao != cls._airport_data['icao'])]
+        # get locations within the bounding area for the radius, exclude self!
+        airport_location = GeoLocation(*cls._get_latlon(icao))
+        in_bounds = airport_location.filter_candidates(cls._airport_data['lat'].to_numpy(),
+                                                       cls._airport_data['lon'].to_numpy(), max_distance_km)
+        locations = cls._airport_data[in_bounds & (icao != cls._airport_data['icao'].to_numpy())]
         if civil_only:
             locations = locations[(locations['type'] == 'civil')]
 
-        locations.set_index('icao', inplace=True)
-        icao_list = pd.DataFrame(columns=['icao', 'distance', 'bearing'])
-        for location_icao, location in locations.iterrows():
+        rows = []
+        for location_icao in locations['icao']:
             distance, bearing = cls.get_airport_distance_bearing(icao, location_icao)
             if min_distance < distance <= max_distance:
-                df = pd.DataFrame([[location_icao, distance, bearing]], columns=icao_list.columns)
-                icao_list = icao_list.append(df)
+                rows.append((location_icao, distance, bearing))
 
+        icao_list = pd.DataFrame(rows, columns=['icao', 'distance', 'bearing'])
         icao_list.set_index('icao', inplace=True)
         return icao_list
+
+
+@functools.lru_cache(maxsize=1_000_000)
+def _geodesic_inverse(first_icao, second_icao):
+    """
+    Solve the WGS84 inverse geodesic problem between two airports. Results are cached.
+
+    :param first_icao: ICAO of first airport
+    :param second_icao: ICAO of second airport
+    :return: Distance in nautical miles, azimuth at the first airport and azimuth at the second airport
+    """
+    first_lat, first_lon = Airports._get_latlon(first_icao)
+    second_lat, second_lon = Airports._get_latlon(second_icao)
+
+    result = Geodesic.WGS84.Inverse(first_lat, first_lon, second_lat, second_lon)
+    return result['s12'] / Airports.METERS_PER_NM, result['azi1'], result['azi2']
+
+
+def _dist_bearing(departure_icao, arrival_icao):
+    """
+    Calculate the distance and bearing between two airports.
+
+    The distance is symmetric so the cache is keyed on the ICAO pair in sorted order. When the pair is reversed the
+    bearing is the forward azimuth at the far end of the geodesic turned through 180 degrees.
+
+    :param departure_icao: ICAO of departure airport
+    :param arrival_icao: ICAO of arrival airport
+    :return: Distance in nautical miles and bearing in degrees (0-360)
+    """
+    if departure_icao <= arrival_icao:
+        distance_nm, bearing, _ = _geodesic_inverse(departure_icao, arrival_icao)
+    else:
+        distance_nm, _, reverse_azimuth = _geodesic_inverse(arrival_icao, departure_icao)
+        bearing = reverse_azimuth + 180
+
+    return distance_nm, bearing % 360
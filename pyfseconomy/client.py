@@ -3,10 +3,15 @@ Client for gathering information from FSEconomy's data feeds
 """
 import datetime
 import io
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum, auto
+from functools import cached_property
 
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from pyfseconomy import Aircraft
 
@@ -42,24 +47,35 @@ class TripTypes(Enum):
     ALL_IN = auto()
 
     def __str__(self):
-        if self.value == self.VIP.value:
-            return "VIP"
-        if self.value == self.TRIP_ONLY.value:
-            return "Trip-Only"
-        if self.value == self.ALL_IN.value:
-            return "All-In"
+        return self._alias
 
-    @staticmethod
-    def list():
+    @cached_property
+    def _alias(self):
+        return _TRIP_TYPE_NAMES[self]
+
+    @classmethod
+    def list(cls):
         """
         Generate a list strings for all trip types supported
         :return: List of all trip types in the enumeration by their strings
         """
-        return list(map(lambda a: str(a), TripTypes))
+        return [str(a) for a in cls]
+
+
+_TRIP_TYPE_NAMES = {
+    TripTypes.VIP: "VIP",
+    TripTypes.TRIP_ONLY: "Trip-Only",
+    TripTypes.ALL_IN: "All-In",
+}
 
 
 class Client:
     URL_ROOT = "https://server.fseconomy.net/data"
+    # Repeated string columns stored as categoricals to speed up filtering and grouping
+    PLANE_CATEGORY_COLUMNS = ['MakeModel', 'Location']
+    JOB_CATEGORY_COLUMNS = ['Location', 'ToIcao', 'UnitType', 'Type']
+    MAX_ICAOS_PER_QUERY = 200
+    MAX_QUERY_WORKERS = 8
 
     class DataFormat(Enum):
         """
@@ -69,18 +85,32 @@ class Client:
         CSV = auto()
 
         def __str__(self):
-            if self.value == self.XML.value:
-                return "xml"
-            if self.value == self.CSV.value:
-                return "csv"
+            return self._alias
 
-    def __init__(self, access_key):
+        @cached_property
+        def _alias(self):
+            return _DATA_FORMAT_NAMES[self]
+
+    def __init__(self, access_key, csv_engine=None):
+        """
+
+        :param access_key: FSE data feed access key
+        :param csv_engine: Parser engine used by pandas for the CSV data feeds. None uses the pandas default, set to
+                           'pyarrow' to use the multithreaded PyArrow reader (requires pyarrow). Note that PyArrow
+                           parses date and time columns to datetime types rather than leaving them as strings.
+        """
         self._access_key = access_key
+        self._csv_engine = csv_engine
         self._retrieval_format = self.DataFormat.CSV
         self._plane_data = None
         self._all_plane_info = None
         self._make_model_list = None
 
+        # Keep connections to the FSE server alive between requests
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=Retry(total=3, backoff_factor=0.3))
+        self._session.mount('https://', adapter)
+
     def _run_request(self, query_parameters):
         """
         Executes the request to the FSE servers.
@@ -91,7 +121,7 @@ class Client:
         :return: Requests class:`Response ` object
         """
 
-        r = requests.get(self.URL_ROOT, params=query_parameters)
+        r = self._session.get(self.URL_ROOT, params=query_parameters)
 
         if r.status_code != requests.codes.ok:
             raise FSEConnectionError(f"Unable to retrieve data - status code is {r.status_code}", r.text)
@@ -100,6 +130,16 @@ class Client:
 
         return r
 
+    def _read_csv(self, text, encoding):
+        """
+        Parse CSV text from the FSE data feeds with the configured engine
+
+        :param text: CSV text
+        :param encoding: Encoding of the text
+        :return: Pandas dataframe of the CSV data
+        """
+        return pd.read_csv(io.StringIO(text), encoding=encoding, engine=self._csv_engine)
+
     def get_plane_data(self, force_update=False):
         """
         Retrieves a list of planes from FSE and caches it. Will return the same list unless forced to update.
@@ -116,12 +156,9 @@ class Client:
 
             cleaned_text = "\n".join(r.text.splitlines())
             cleaned_text = cleaned_text.replace(",\n", "\n")
-            self._plane_data = pd.read_csv(io.StringIO(cleaned_text), encoding=r.encoding)
-
-            self._all_plane_info = {}
+            self._plane_data = self._read_csv(cleaned_text, r.encoding)
 
-            for idx, plane_info in self._plane_data.iterrows():
-                self._all_plane_info[plane_info['MakeModel']] = Aircraft.aircraft_from_data(plane_info)
+            self._all_plane_info = Aircraft.aircraft_from_dataframe(self._plane_data)
 
         return self._all_plane_info
 
@@ -137,7 +174,7 @@ class Client:
         :param max_hours_since_100hr: Maximum number of hours since last 100hr service. Default is 95.
         :return: Pandas data frame with the result of the query, filtered as requested
         """
-        if str(plane_type) not in self.get_plane_data().keys():
+        if str(plane_type) not in self.get_plane_data():
             raise FSEInvalidPlaneType(f"Invalid requested_plane type \"{plane_type}\"")
 
         query_parameters = {
@@ -149,14 +186,17 @@ class Client:
         }
         r = self._run_request(query_parameters)
 
+        # Always use the default parser as PyArrow would read some TimeLast100hr values as times of day
         plane_data = pd.read_csv(io.StringIO(r.text), encoding=r.encoding)
+        plane_data = plane_data.astype(dict.fromkeys(self.PLANE_CATEGORY_COLUMNS, 'category'))
 
         # Filtering operations for rentable, time since last 100 hour
         if rentable_only:
             plane_data = plane_data[(plane_data['RentedBy'] == 'Not rented.') &
                                     ((plane_data['RentalDry'] > 0.0) | (plane_data['RentalWet'] > 0.0))]
 
-        plane_data['TimeLast100hr'] = plane_data['TimeLast100hr'].map(str_to_timedelta)
+        # hh:mm is extended to hh:mm:ss so pandas can parse the whole column at once
+        plane_data['TimeLast100hr'] = pd.to_timedelta(plane_data['TimeLast100hr'] + ':00')
         max_hours_since_100hr = datetime.timedelta(hours=max_hours_since_100hr)
         plane_data = plane_data[(plane_data['TimeLast100hr'] <= max_hours_since_100hr)]
 
@@ -178,18 +218,15 @@ class Client:
         }
         r = self._run_request(query_parameters)
 
-        user_plane_data = pd.read_csv(io.StringIO(r.text), encoding=r.encoding)
+        user_plane_data = self._read_csv(r.text, r.encoding)
+        user_plane_data = user_plane_data.astype(dict.fromkeys(self.PLANE_CATEGORY_COLUMNS, 'category'))
 
         return user_plane_data
 
-    def get_location_available_jobs(self, icao_list, max_cargo=100000, max_passengers=1000,
-                                    limit_trip_type_to: TripTypes = None):
+    def _get_jobs_from(self, icao_list):
         """
-        Get the available jobs going from a list of ICAOs
+        Query the jobs available from a list of ICAOs
 
-        :param limit_trip_type_to: List of trip types to limit to, None means no filter
-        :param max_passengers:
-        :param max_cargo:
         :param icao_list: List of ICAOs
         :return: Pandas dataframe with jobs for each ICAO
         """
@@ -203,12 +240,40 @@ class Client:
         }
         r = self._run_request(query_parameters)
 
-        plane_data = pd.read_csv(io.StringIO(r.text), encoding=r.encoding)
+        return self._read_csv(r.text, r.encoding)
 
-        plane_data = plane_data[(((plane_data['UnitType'] == 'kg') & (plane_data['Amount'] < max_cargo)) |
-                                 ((plane_data['UnitType'] == 'passengers') & (plane_data['Amount'] < max_passengers)))]
+    def get_location_available_jobs(self, icao_list, max_cargo=100000, max_passengers=1000,
+                                    limit_trip_type_to: TripTypes = None):
+        """
+        Get the available jobs going from a list of ICAOs
+
+        Long ICAO lists are split into several queries which are run in parallel.
+
+        :param limit_trip_type_to: List of trip types to limit to, None means no filter
+        :param max_passengers:
+        :param max_cargo:
+        :param icao_list: List of ICAOs
+        :return: Pandas dataframe with jobs for each ICAO
+        """
+        icao_list = list(icao_list)
+        icao_chunks = [icao_list[idx:idx + self.MAX_ICAOS_PER_QUERY]
+                       for idx in range(0, len(icao_list), self.MAX_ICAOS_PER_QUERY)] or [icao_list]
+        with ThreadPoolExecutor(max_workers=self.MAX_QUERY_WORKERS) as executor:
+            plane_data = pd.concat(executor.map(self._get_jobs_from, icao_chunks), ignore_index=True)
+        plane_data = plane_data.astype(dict.fromkeys(self.JOB_CATEGORY_COLUMNS, 'category'))
+
+        unit_type = plane_data['UnitType']
+        amount = plane_data['Amount'].to_numpy()
+        plane_data = plane_data[np.where((unit_type == 'kg').to_numpy(), amount < max_cargo,
+                                         (unit_type == 'passengers').to_numpy() & (amount < max_passengers))]
 
         if limit_trip_type_to is not None:
             plane_data = plane_data[(plane_data['Type'] == str(limit_trip_type_to))]
 
         return plane_data
+
+
+_DATA_FORMAT_NAMES = {
+    Client.DataFormat.XML: "xml",
+    Client.DataFormat.CSV: "csv",
+}
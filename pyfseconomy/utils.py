@@ -2,98 +2,236 @@
 This file contains useful functions that can be used to process data gathered from FSE data feeds via the client
 """
 import math
-from collections import OrderedDict
-from operator import itemgetter
+
+import numpy as np
+import pandas as pd
 
 from pyfseconomy import Aircraft, TripTypes
 
+_VIP_STR = str(TripTypes.VIP)
+_ALLIN_STR = str(TripTypes.ALL_IN)
+# Only the assignment columns used when loading planes
+_LOADING_COLUMNS = ['Id', 'Pay', 'Amount', 'UnitType', 'Type', 'AircraftId', 'Commodity']
+# Limits on the number of assignments and the size of the table for finding the best load exactly
+_EXACT_PACKING_MAX_ITEMS = 500
+_EXACT_PACKING_MAX_CAPACITY = 1_000_000
+_EXACT_PACKING_MAX_CELLS = 10_000_000
+
 
-class PlaneLoadingError(BaseException):
+class PlaneLoadingError(Exception):
     pass
 
 
 def order_assignment_by_value(assignments):
     """
-    Calculate the value - the $/kg - of each of the assignments, then sort them by value into a dictionary keyed
-    with the assignment ID
+    Calculate the value - the $/kg - of each of the assignments, then sort them by value into a list of assignment ID
+    and value pairs
 
     :param assignments: Assigments dataframe
-    :return: OrderedDict of assignments, keyed by ID - sorted by the value which is $/kg.
+    :return: List of (ID, value) tuples - sorted by the value which is $/kg.
     """
-    assignment_value_list = {}
-    for _, assignment in assignments.iterrows():
-        pay = assignment['Pay']
-        weight = assignment['Amount']
-        if pay > 0 and weight > 0:
-            if assignment['UnitType'] == 'passengers':
-                weight *= Aircraft.PAX_WEIGHT_KG
-            value = pay / weight
-            assignment_value_list[assignment['Id']] = value
-    return OrderedDict(sorted(assignment_value_list.items(), key=itemgetter(1), reverse=True))
+    # single precision is plenty for ranking by $/kg and halves the memory the calculation works through
+    pay = assignments['Pay'].to_numpy(dtype=np.float32)
+    amount = assignments['Amount'].to_numpy(dtype=np.float32)
+    weight = np.where((assignments['UnitType'] == 'passengers').to_numpy(), amount * Aircraft.PAX_WEIGHT_KG, amount)
+    valid = (pay > 0) & (amount > 0)
+
+    assignment_ids = assignments['Id'].to_numpy()[valid]
+    values = pay[valid] / weight[valid]
+    order = np.argsort(-values, kind='stable')
+    return list(zip(assignment_ids[order].tolist(), values[order].tolist()))
 
 
 def load_assignments(assignment_list, assignments_by_id, intial_remaining_payload, intial_remaining_pax, aircraft_id):
     """
-    Loads assignments up to the remaining payload or pax in the order given.
+    Loads assignments up to the remaining payload or pax in the order given, or the most valuable combination of them
+    when there are few enough to find it exactly.
 
-    :param assignment_list: A list of assignments in the order in which they should be loaded.
+    :param assignment_list: A list of (ID, value) tuples in the order in which the assignments should be loaded.
     :param assignments_by_id: Dataframe of assignments indexed by their FSE ID
     :param intial_remaining_payload: Starting available payload that can be used (include Pax in this)
     :param intial_remaining_pax: Starting available pax that can be used
     :param aircraft_id: FSE Aircraft identifier - used to load All In trips that are tied to a specific aircraft
     :return: Tuple of Total value of assignments and list of loaded assignment IDs
     """
-    assignment_ids = []
-    remaining_payload = intial_remaining_payload
-    remaining_pax = intial_remaining_pax
+    # Arrange the columns in loading order once so the loading loop only works on plain Python values
+    positions = {assignment_id: idx for idx, assignment_id in enumerate(assignments_by_id.index)}
+    ordered_ids = [assignment_id for assignment_id, _ in assignment_list]
+    order = [positions[assignment_id] for assignment_id in ordered_ids]
+    amounts = assignments_by_id['Amount'].to_numpy()[order]
+    is_pax = (assignments_by_id['UnitType'] == 'passengers').to_numpy()[order]
+    is_vip = (assignments_by_id['Type'] == _VIP_STR).to_numpy()[order]
+    is_allin = (assignments_by_id['Type'] == _ALLIN_STR).to_numpy()[order]
+    # All In jobs can only be loaded into the aircraft they are associated with
+    loadable = ~is_allin | (assignments_by_id['AircraftId'].to_numpy()[order] == aircraft_id)
+
+    total_value, selected = _select_loads(np.where(is_pax, amounts * Aircraft.PAX_WEIGHT_KG, amounts).tolist(),
+                                          assignments_by_id['Pay'].to_numpy()[order].tolist(),
+                                          np.where(is_pax, amounts, 0).tolist(), (is_vip | is_allin).tolist(),
+                                          loadable.tolist(), intial_remaining_payload, intial_remaining_pax)
+
+    # names are only built for the assignments that were loaded
+    commodities = assignments_by_id['Commodity']
+    assignment_ids = [(ordered_ids[idx], f"{amounts[idx]} {commodities.iat[order[idx]]}") for idx in selected]
+    return total_value, assignment_ids
+
+
+def _select_loads(weights, pays, pax_counts, exclusive, loadable, payload, pax):
+    """
+    Choose which items to load. An exclusive item is always loaded on its own.
+
+    When there are few enough items, the payload is small enough and the pax limit cannot be reached, the most valuable
+    combination of items is found exactly, and compared with the most valuable exclusive item. Otherwise items are
+    loaded greedily in the order given, skipping any that do not fit, and an exclusive item is only loaded if it is the
+    first that fits.
+
+    :param weights: Weight of each item, including passengers
+    :param pays: Pay for each item
+    :param pax_counts: Number of passengers for each item
+    :param exclusive: Flags for items that must be the only load
+    :param loadable: Flags for items that are allowed to be loaded into this plane
+    :param payload: Available payload
+    :param pax: Available pax
+    :return: Total pay of the loaded items and a list of their indices
+    """
+    normal_items = [idx for idx in range(len(weights)) if not exclusive[idx]]
+
+    # with no normal items there is nothing to pack, only the best exclusive item to choose
+    exact_packing = (len(normal_items) <= _EXACT_PACKING_MAX_ITEMS and
+                     payload + 1 <= _EXACT_PACKING_MAX_CAPACITY and
+                     len(normal_items) * (payload + 1) <= _EXACT_PACKING_MAX_CELLS and
+                     sum(pax_counts[idx] for idx in normal_items) <= pax)
+    if not normal_items or exact_packing:
+        total_value, selected = _pack_normal(weights, pays, pax_counts, normal_items, payload, pax)
+        if normal_items:
+            # the exact packing works in whole kg so keep the greedy packing if rounding means it is better
+            optimal_value, optimal_selected = _pack_optimal(weights, pays, normal_items, payload)
+            if optimal_value > total_value:
+                total_value, selected = optimal_value, optimal_selected
+
+        exclusive_items = [idx for idx in range(len(weights)) if exclusive[idx] and loadable[idx] and
+                           pax_counts[idx] <= pax and weights[idx] <= payload]
+        if exclusive_items:
+            best_exclusive = max(exclusive_items, key=lambda idx: pays[idx])
+            if pays[best_exclusive] > total_value:
+                return pays[best_exclusive], [best_exclusive]
+        return total_value, selected
+
+    exclusive_idx = _try_exclusive(weights, pax_counts, exclusive, loadable, payload, pax)
+    if exclusive_idx is not None:
+        return pays[exclusive_idx], [exclusive_idx]
+
+    return _pack_normal(weights, pays, pax_counts, normal_items, payload, pax)
+
+
+def _try_exclusive(weights, pax_counts, exclusive, loadable, payload, pax):
+    """
+    Find an exclusive item to load. One is only loaded when it is the first item in the loading order that fits into
+    the empty plane, otherwise a normal item is loaded first and exclusive items can no longer be added.
+
+    :param weights: Weight of each item, including passengers
+    :param pax_counts: Number of passengers for each item
+    :param exclusive: Flags for items that must be the only load
+    :param loadable: Flags for items that are allowed to be loaded into this plane
+    :param payload: Available payload
+    :param pax: Available pax
+    :return: Index of the exclusive item to load, None if normal items should be loaded instead
+    """
+    for idx in range(len(weights)):
+        if loadable[idx] and pax_counts[idx] <= pax and weights[idx] <= payload:
+            return idx if exclusive[idx] else None
+    return None
+
+
+def _pack_normal(weights, pays, pax_counts, items, payload, pax):
+    """
+    Load normal items in the order given, skipping any that do not fit in the remaining payload or pax.
+
+    :param weights: Weight of each item, including passengers
+    :param pays: Pay for each item
+    :param pax_counts: Number of passengers for each item
+    :param items: Indices of the items to consider, in loading order
+    :param payload: Available payload
+    :param pax: Available pax
+    :return: Total pay of the loaded items and a list of their indices
+    """
+    # at most every item is loaded, so allocate for that once and trim at the end
+    selected = [0] * len(items)
+    selected_count = 0
+    remaining_payload = payload
+    remaining_pax = pax
     total_value = 0
 
-    for assignment_id, _ in assignment_list.items():
-        load_into_plane = True
+    for idx in items:
+        if pax_counts[idx] <= remaining_pax and weights[idx] <= remaining_payload:
+            selected[selected_count] = idx
+            selected_count += 1
+            total_value += pays[idx]
+            remaining_payload -= weights[idx]
+            remaining_pax -= pax_counts[idx]
 
-        unit_type = assignments_by_id.at[assignment_id, "UnitType"]
-        amount = assignments_by_id.at[assignment_id, "Amount"]
-        pay = assignments_by_id.at[assignment_id, "Pay"]
-        assignment_name = f"{amount} {assignments_by_id.at[assignment_id, 'Commodity']}"
-        type_is_vip = assignments_by_id.at[assignment_id, "Type"] == str(TripTypes.VIP)
-        type_is_allin = assignments_by_id.at[assignment_id, "Type"] == str(TripTypes.ALL_IN)
-        exclusive_load = type_is_allin or type_is_vip
+    return total_value, selected[:selected_count]
 
-        if exclusive_load and remaining_payload != intial_remaining_payload:
-            print("WARNING: Attempted to load VIP or All-In job with normal Trip payload")
-            continue
 
-        if assignments_by_id.at[assignment_id, "Type"] == str(TripTypes.ALL_IN):
-            # Only load if it's associated with this requested_plane
-            load_into_plane = aircraft_id == assignments_by_id.at[assignment_id, "AircraftId"]
+def _pack_optimal(weights, pays, items, payload):
+    """
+    Find the combination of items with the highest total pay that fits in the payload. This is solved exactly as a 0/1
+    knapsack over whole kilograms, with weights rounded up so the combination found always fits.
+
+    :param weights: Weight of each item
+    :param pays: Pay for each item
+    :param items: Indices of the items to consider, in loading order
+    :param payload: Available payload
+    :return: Total pay of the loaded items and a list of their indices, in loading order
+    """
+    capacity = math.floor(payload)
+    if capacity < 0:
+        return 0, []
+
+    # best_pay[w] is the highest pay from the items so far weighing at most w
+    best_pay = np.zeros(capacity + 1)
+    taken = np.zeros((len(items), capacity + 1), dtype=bool)
+    for row, idx in enumerate(items):
+        weight = math.ceil(weights[idx])
+        if weight > capacity:
+            continue
+        pay_with_item = best_pay[:capacity + 1 - weight] + pays[idx]
+        improved = pay_with_item > best_pay[weight:]
+        taken[row, weight:] = improved
+        best_pay[weight:] = np.where(improved, pay_with_item, best_pay[weight:])
 
-        if unit_type == 'passengers':
-            if amount > remaining_pax:
-                load_into_plane = False
-            amount *= Aircraft.PAX_WEIGHT_KG
+    selected = []
+    remaining_capacity = capacity
+    for row in range(len(items) - 1, -1, -1):
+        if taken[row, remaining_capacity]:
+            selected.append(items[row])
+            remaining_capacity -= math.ceil(weights[items[row]])
+    selected.reverse()
 
-        if amount > remaining_payload:
-            load_into_plane = False
+    return sum(pays[idx] for idx in selected), selected
 
-        if load_into_plane:
-            assignment_ids.append((assignment_id, assignment_name))
-            total_value += pay
-            remaining_payload -= amount
-            if unit_type == 'passengers':
-                remaining_pax -= amount / Aircraft.PAX_WEIGHT_KG
 
-        # no more jobs - we now have 1 exclusive payload
-        if exclusive_load and load_into_plane:
-            break
+def index_assignments(assignments):
+    """
+    Index assignments by their FSE ID ready for loading. Callers loading several planes from the same assignments can
+    do this once and pass the result to plane_loader.
 
-    return total_value, assignment_ids
+    :param assignments: Assignments dataframe
+    :return: Dataframe of assignments indexed by their FSE ID
+    """
+    assignments_by_id = assignments[_LOADING_COLUMNS].set_index("Id")
+    # Categorical columns make the unit and trip type comparisons integer code comparisons
+    to_category = {column: 'category' for column in ('UnitType', 'Type')
+                   if not isinstance(assignments_by_id[column].dtype, pd.CategoricalDtype)}
+    return assignments_by_id.astype(to_category) if to_category else assignments_by_id
 
 
 def plane_loader(assignments, aircraft_id, max_payload=None, max_pax=None, fuel_pct=1.0,
-                 aircraft_data=None):
+                 aircraft_data=None, assignments_by_id=None, assignment_values=None):
     """
     Loads the most valuable assignments first until one doesn't fit and then continues to load the next most valuable
-    that will fit up until the max_payload or max_pax is reached, but not exceeded.
+    that will fit up until the max_payload or max_pax is reached, but not exceeded. When there are only a few
+    assignments and the pax limit can't be reached, the combination with the highest total pay is found exactly instead.
 
     Will also only load planes with a single VIP or All in load.
 
@@ -104,9 +242,13 @@ def plane_loader(assignments, aircraft_id, max_payload=None, max_pax=None, fuel_
     :param max_payload: Max total payload (including pax) the requested_plane and hold at the fuel level you want, set
                         to None for automatic values
     :param max_pax: Maximum number of passengers
+    :param assignments_by_id: Optional assignments already indexed with index_assignments, saves indexing them again
+    :param assignment_values: Optional assignments already ordered with order_assignment_by_value, saves ordering them
+                              again
     :return: Total value and list of loaded assignments IDs
     """
-    assignments_by_id = assignments.set_index("Id")
+    if assignments_by_id is None:
+        assignments_by_id = index_assignments(assignments)
     if aircraft_data is not None:
         starting_pax, starting_payload = aircraft_data.get_pax_cargo_for_fuel(fuel_pct)
     elif max_payload is not None and max_pax is not None:
@@ -115,7 +257,8 @@ def plane_loader(assignments, aircraft_id, max_payload=None, max_pax=None, fuel_
     else:
         raise PlaneLoadingError("Expect max_payload and max_pax or aircraft_data")
 
-    assignment_values = order_assignment_by_value(assignments)
+    if assignment_values is None:
+        assignment_values = order_assignment_by_value(assignments)
     total_value, assignment_ids = load_assignments(assignment_values, assignments_by_id, starting_payload, starting_pax,
                                                    aircraft_id)
 
@@ -138,6 +281,7 @@ class GeoLocation:
     def __init__(self, lat, lon):
         self.rad_lat = math.radians(lat)
         self.rad_lon = math.radians(lon)
+        self.cos_lat = math.cos(self.rad_lat)
 
     def bounding_coordinates(self, distance, radius=EARTH_RADIUS_KM):
         """
@@ -147,29 +291,99 @@ class GeoLocation:
         :param radius: Radius of the sphere
         :return: min latitude, min longitude, max latitude, max longitude
         """
+        min_lat, min_lon, max_lat, max_lon = _bounding_coordinates(self.rad_lat, self.rad_lon, self.cos_lat,
+                                                                   distance / radius)
+        return math.degrees(min_lat), math.degrees(min_lon), math.degrees(max_lat), math.degrees(max_lon)
 
-        # angular distance in radians on a great circle
-        rad_dist = distance / radius
+    def filter_candidates(self, lats, lons, distance):
+        """
+        Find the points within the bounding box of a distance from this location. Points outside the box are further
+        away than the distance so can be excluded before calculating exact distances.
 
-        min_lat = self.rad_lat - rad_dist
-        max_lat = self.rad_lat + rad_dist
+        :param lats: Array of point latitudes, in degrees
+        :param lons: Array of point longitudes, in degrees
+        :param distance: Max distance from this location, in KM
+        :return: Boolean array, True for points inside the bounding box
+        """
+        min_lat, min_lon, max_lat, max_lon = self.bounding_coordinates(distance)
+        lats = np.asarray(lats)
+        lons = np.asarray(lons)
 
-        # calculate the min & max longitude
-        if min_lat > self.MIN_LAT and max_lat < self.MAX_LAT:
-            delta_lon = math.asin(math.sin(rad_dist) / math.cos(self.rad_lat))
+        in_lat_range = (min_lat <= lats) & (lats <= max_lat)
+        if min_lon <= max_lon:
+            return in_lat_range & (min_lon <= lons) & (lons <= max_lon)
+        # bounding box crosses the anti-meridian
+        return in_lat_range & ((min_lon <= lons) | (lons <= max_lon))
 
-            min_lon = self.rad_lon - delta_lon
-            if min_lon < self.MIN_LON:
-                min_lon += 2 * math.pi
 
-            max_lon = self.rad_lon + delta_lon
-            if max_lon > self.MAX_LON:
-                max_lon -= 2 * math.pi
-        else:
-            # pole is within bounding area
-            min_lat = max(min_lat, self.MIN_LAT)
-            max_lat = min(max_lat, self.MAX_LAT)
-            min_lon = self.MIN_LON
-            max_lon = self.MAX_LON
+def _bounding_coordinates(rad_lat, rad_lon, cos_lat, rad_dist):
+    """
+    Calculate the bounding box of an angular distance from a point on a sphere, working purely in radians
 
-        return math.degrees(min_lat), math.degrees(min_lon), math.degrees(max_lat), math.degrees(max_lon)
+    :param rad_lat: Latitude of the point, in radians
+    :param rad_lon: Longitude of the point, in radians
+    :param cos_lat: Cosine of the latitude
+    :param rad_dist: Angular distance from the point, in radians
+    :return: min latitude, min longitude, max latitude, max longitude in radians
+    """
+    min_lat = rad_lat - rad_dist
+    max_lat = rad_lat + rad_dist
+
+    # calculate the min & max longitude
+    if min_lat > GeoLocation.MIN_LAT and max_lat < GeoLocation.MAX_LAT:
+        delta_lon = math.asin(math.sin(rad_dist) / cos_lat)
+
+        min_lon = rad_lon - delta_lon
+        if min_lon < GeoLocation.MIN_LON:
+            min_lon += 2 * math.pi
+
+        max_lon = rad_lon + delta_lon
+        if max_lon > GeoLocation.MAX_LON:
+            max_lon -= 2 * math.pi
+    else:
+        # pole is within bounding area
+        min_lat = max(min_lat, GeoLocation.MIN_LAT)
+        max_lat = min(max_lat, GeoLocation.MAX_LAT)
+        min_lon = GeoLocation.MIN_LON
+        max_lon = GeoLocation.MAX_LON
+
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def bounding_coordinates_bulk(lats, lons, distance, radius=GeoLocation.EARTH_RADIUS_KM):
+    """
+    Calculate the max latitude and longitude a distance from many points on a sphere at once. This is the array
+    version of GeoLocation.bounding_coordinates.
+
+    :param lats: Array of point latitudes, in degrees
+    :param lons: Array of point longitudes, in degrees
+    :param distance: Max distance from the points, in KM
+    :param radius: Radius of the sphere
+    :return: Arrays of min latitude, min longitude, max latitude, max longitude
+    """
+    rad_lat = np.radians(lats)
+    rad_lon = np.radians(lons)
+
+    # angular distance in radians on a great circle
+    rad_dist = distance / radius
+
+    min_lat = rad_lat - rad_dist
+    max_lat = rad_lat + rad_dist
+    pole_within = ~((min_lat > GeoLocation.MIN_LAT) & (max_lat < GeoLocation.MAX_LAT))
+
+    # calculate the min & max longitude, the result is only invalid where a pole is within the bounding area
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta_lon = np.arcsin(np.sin(rad_dist) / np.cos(rad_lat))
+
+    min_lon = rad_lon - delta_lon
+    min_lon = np.where(min_lon < GeoLocation.MIN_LON, min_lon + 2 * math.pi, min_lon)
+    max_lon = rad_lon + delta_lon
+    max_lon = np.where(max_lon > GeoLocation.MAX_LON, max_lon - 2 * math.pi, max_lon)
+
+    # pole is within bounding area
+    min_lat = np.where(pole_within, np.maximum(min_lat, GeoLocation.MIN_LAT), min_lat)
+    max_lat = np.where(pole_within, np.minimum(max_lat, GeoLocation.MAX_LAT), max_lat)
+    min_lon = np.where(pole_within, GeoLocation.MIN_LON, min_lon)
+    max_lon = np.where(pole_within, GeoLocation.MAX_LON, max_lon)
+
+    return np.degrees(min_lat), np.degrees(min_lon), np.degrees(max_lat), np.degrees(max_lon)
@@ -16,10 +16,14 @@ setuptools.setup(
         "pyfseconomy": ["icaodata.csv"],
     },
     install_requires=[
-        'pandas~=1.5.2',
+        'pandas>=1.5',
         'requests~=2.28.1',
         'geographiclib~=2.0',
+        'numpy>=1.23',
     ],
+    extras_require={
+        'arrow': ['pyarrow'],
+    },
     python_requires='>=3.8',
     classifiers=[
         "Programming Language :: Python :: 3",
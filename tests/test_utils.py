@@ -0,0 +1,84 @@
+import itertools
+import random
+
+import pytest
+
+from pyfseconomy.utils import _select_loads
+
+
+def _brute_force_pay(weights, pays, pax_counts, exclusive, loadable, payload, pax):
+    best_pay = 0
+    for idx in range(len(weights)):
+        if exclusive[idx] and loadable[idx] and weights[idx] <= payload and pax_counts[idx] <= pax:
+            best_pay = max(best_pay, pays[idx])
+    normal_items = [idx for idx in range(len(weights)) if not exclusive[idx]]
+    for count in range(1, len(normal_items) + 1):
+        for items in itertools.combinations(normal_items, count):
+            if (sum(weights[idx] for idx in items) <= payload and
+                    sum(pax_counts[idx] for idx in items) <= pax):
+                best_pay = max(best_pay, sum(pays[idx] for idx in items))
+    return best_pay
+
+
+def _greedy_load(weights, pays, pax_counts, exclusive, loadable, payload, pax):
+    selected = []
+    remaining_payload = payload
+    remaining_pax = pax
+    for idx in range(len(weights)):
+        if exclusive[idx] and selected:
+            continue
+        if loadable[idx] and pax_counts[idx] <= remaining_pax and weights[idx] <= remaining_payload:
+            selected.append(idx)
+            remaining_payload -= weights[idx]
+            remaining_pax -= pax_counts[idx]
+            if exclusive[idx]:
+                break
+    return sum(pays[idx] for idx in selected), selected
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_select_loads_matches_brute_force(seed):
+    rng = random.Random(seed)
+    item_count = rng.randint(0, 8)
+    pax_counts = [rng.choice([0, 0, 1, 2, 5]) for _ in range(item_count)]
+    weights = [pax_count * 77 if pax_count else rng.randint(1, 1500) for pax_count in pax_counts]
+    pays = [rng.randint(1, 5000) for _ in range(item_count)]
+    exclusive = [rng.random() < 0.2 for _ in range(item_count)]
+    loadable = [rng.random() < 0.8 for _ in range(item_count)]
+    payload = rng.randint(0, 3000)
+    pax = 100
+
+    total_pay, selected = _select_loads(weights, pays, pax_counts, exclusive, loadable, payload, pax)
+
+    assert total_pay == _brute_force_pay(weights, pays, pax_counts, exclusive, loadable, payload, pax)
+    assert total_pay == sum(pays[idx] for idx in selected)
+    assert sum(weights[idx] for idx in selected) <= payload
+    assert sum(pax_counts[idx] for idx in selected) <= pax
+    assert len(selected) == 1 or not any(exclusive[idx] for idx in selected)
+
+
+def test_select_loads_large_payload():
+    # neither of these should build a packing table sized by the payload
+    assert _select_loads([100], [500], [1], [True], [True], 1e12, 10) == (500, [0])
+    assert _select_loads([100, 200], [500, 300], [0, 0], [False, False], [True, True], 1e12, 10) == (800, [0, 1])
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_select_loads_pax_limited_is_greedy(seed):
+    rng = random.Random(seed)
+    item_count = rng.randint(1, 8)
+    # at least one normal passenger item, anywhere in the loading order
+    pax_item = rng.randrange(item_count)
+    pax_counts = [rng.randint(1, 5) if idx == pax_item else rng.choice([0, 0, 1, 2, 5]) for idx in range(item_count)]
+    weights = [pax_count * 77 if pax_count else rng.randint(1, 1500) for pax_count in pax_counts]
+    pays = [rng.randint(1, 5000) for _ in range(item_count)]
+    exclusive = [idx != pax_item and rng.random() < 0.3 for idx in range(item_count)]
+    # only All-In loads are tied to an aircraft, so only exclusive items can be unloadable
+    loadable = [not is_exclusive or rng.random() < 0.8 for is_exclusive in exclusive]
+    payload = rng.randint(0, 3000)
+    normal_pax = sum(pax_count for pax_count, is_exclusive in zip(pax_counts, exclusive) if not is_exclusive)
+    # fewer seats than the normal items need, so the pax limit binds and the greedy loading is used
+    pax = rng.randint(0, normal_pax - 1)
+
+    assert _select_loads(weights, pays, pax_counts, exclusive, loadable, payload, pax) == \
+        _greedy_load(weights, pays, pax_counts, exclusive, loadable, payload, pax)